@@ -0,0 +1,46 @@
+"""
+Numeric kernels used by algo_strategy.py on the hot path of a turn.
+
+The kernels only take numpy arrays and are compiled with numba when it is
+installed. Without numba they still run, just as plain python loops.
+"""
+
+import math
+import numpy as np
+
+try:
+    from numba import njit
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+
+    def njit(*args, **kwargs):
+        return lambda func: func
+
+
+@njit(cache=True, fastmath=True)
+def threat_grid(tx, ty, dmg, rng2, size):
+    """Builds the turret damage a mobile unit takes on every tile of the board
+
+    Args:
+        tx: int32 array of turret x coordinates
+        ty: int32 array of turret y coordinates
+        dmg: float32 array of damage each turret deals per tile in range
+        rng2: float32 array of each turret's squared attack range
+        size: The width and height of the board
+
+    Returns:
+        A (size, size) float32 array indexed [y, x] holding the summed damage of every turret in range of that tile
+
+    """
+    grid = np.zeros((size, size), np.float32)
+    for j in range(tx.shape[0]):
+        # Only walk the tiles in the bounding box of the turret's range, with a tile of slack for rounding
+        reach = int(math.sqrt(rng2[j])) + 1
+        for y in range(max(ty[j] - reach, 0), min(ty[j] + reach + 1, size)):
+            for x in range(max(tx[j] - reach, 0), min(tx[j] + reach + 1, size)):
+                dx = x - tx[j]
+                dy = y - ty[j]
+                if dx * dx + dy * dy <= rng2[j]:
+                    grid[y, x] += dmg[j]
+    return grid
@@ -2,8 +2,15 @@ import gamelib
 import random
 import math
 import warnings
-from sys import maxsize
+import os
 import json
+import numpy as np
+from _kernels import HAVE_NUMBA, threat_grid
+
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    json_loads = json.loads
 
 
 """
@@ -19,10 +26,44 @@ Advanced strategy tips:
   the actual current map state.
 """
 
+ARENA_SIZE = 28
+# Filler for tiles without a structure in the board snapshot grids
+EMPTY = 255
+# Row (y) and column (x) of every tile, laid out like the snapshot grids
+Y_INDEX, X_INDEX = np.indices((ARENA_SIZE, ARENA_SIZE))
+# Bit x of a row bitboard stands for column x
+COLUMN_BITS = np.uint64(1) << np.arange(ARENA_SIZE, dtype=np.uint64)
+
+# Hardcoded build locations, shared by every turn
+TURRET_LOCATIONS = ((11, 11), (16, 11))
+WALL_LOCATIONS = tuple((x, 13) for x in (5, 6, 7, 8, 9, 18, 19, 20, 21, 22))
+SUPPORT_LOCATIONS = ((13, 2), (14, 2), (13, 3), (14, 3))
+# Rows of structures topped up by update_defence every turn
+WALL_ROW_LEFT = tuple((x, 13) for x in range(1, 10))
+WALL_ROW_RIGHT = tuple((x, 13) for x in range(17, 27))
+SUPPORT_ROW_LEFT = tuple((x, 13) for x in range(1, 4))
+SUPPORT_ROW_RIGHT = tuple((x, 13) for x in range(24, 27))
+# Line that keeps our demolishers at long range from the enemy's front rows
+DEMOLISHER_LINE = tuple((x, 11) for x in range(27, 5, -1))
+# Kept as lists since can_spawn compares mobile spawns against lists of edge locations
+SCOUT_SPAWN_OPTIONS = ([13, 0], [14, 0])
+
+
+def _threat_grid_numpy(tx, ty, dmg, rng2, size):
+    """
+    Same as _kernels.threat_grid, but broadcasts every tile against every turret with numpy.
+    """
+    dist2 = (X_INDEX[:size, :size, None] - tx) ** 2 + (Y_INDEX[:size, :size, None] - ty) ** 2
+    return np.where(dist2 <= rng2, dmg, 0).sum(axis=2).astype(np.float32)
+
+
+# Uncompiled, the kernel is a set of python loops, so prefer numpy broadcasting without numba
+build_threat_grid = threat_grid if HAVE_NUMBA else _threat_grid_numpy
+
 class AlgoStrategy(gamelib.AlgoCore):
     def __init__(self):
         super().__init__()
-        seed = random.randrange(maxsize)
+        seed = int.from_bytes(os.urandom(8), 'little')
         random.seed(seed)
         gamelib.debug_write('Random seed: {}'.format(seed))
 
@@ -41,8 +82,33 @@ class AlgoStrategy(gamelib.AlgoCore):
         INTERCEPTOR = config["unitInformation"][5]["shorthand"]
         MP = 1
         SP = 0
+        # Snapshot grids store units by their index in unitInformation
+        self.unit_ids = {unit["shorthand"]: i for i, unit in enumerate(config["unitInformation"])}
+        # Turret damage and squared range, indexed by whether the turret is upgraded
+        turret_info = config["unitInformation"][2]
+        turret_upgrade = turret_info.get("upgrade", {})
+        turret_damage = turret_info.get("attackDamageWalker", 0)
+        turret_range = turret_info.get("attackRange", 0)
+        self.turret_damage = np.array([turret_damage, turret_upgrade.get("attackDamageWalker", turret_damage)], np.float32)
+        self.turret_range2 = np.array([turret_range, turret_upgrade.get("attackRange", turret_range)], np.float32) ** 2
         # This is a good place to do initial setup
-        self.scored_on_locations = []
+        # Unique (x, y) locations the opponent scored on us from
+        self.scored_on_locations = set()
+        self._path_board_key = None
+        self._path_cache = {}
+        self._defence_cmp_cache = {}
+        self._warm_kernels()
+
+    def _warm_kernels(self):
+        """
+        Calls each numba kernel once with the argument types used during a turn
+        so compiling (or loading the on-disk cache) happens before turn 1 instead of inside it.
+        """
+        if not HAVE_NUMBA:
+            return
+        coords = np.zeros(1, np.int32)
+        values = np.zeros(1, np.float32)
+        threat_grid(coords, coords, values, values, ARENA_SIZE)
 
     def on_turn(self, turn_state):
         """
@@ -55,11 +121,36 @@ class AlgoStrategy(gamelib.AlgoCore):
         game_state = gamelib.GameState(self.config, turn_state)
         gamelib.debug_write('Performing turn {} of your custom algo strategy'.format(game_state.turn_number))
         game_state.suppress_warnings(True)  #Comment or remove this line to enable warnings.
+        self._snapshot(game_state)
 
         self.starter_strategy(game_state)
 
         game_state.submit_turn()
 
+    def _snapshot(self, game_state):
+        """
+        Copies the structures on the board into 28x28 uint8 grids indexed [y, x]
+        (unit type, owner, health and upgraded) so the helpers below can use numpy
+        reductions instead of walking the GameMap tile by tile.
+        Tiles without a structure hold EMPTY in the type and owner grids.
+        Enemy occupancy is also packed into one uint64 bitboard per row.
+        """
+        self._type = np.full((ARENA_SIZE, ARENA_SIZE), EMPTY, np.uint8)
+        self._owner = np.full((ARENA_SIZE, ARENA_SIZE), EMPTY, np.uint8)
+        self._hp = np.zeros((ARENA_SIZE, ARENA_SIZE), np.uint8)
+        self._upgraded = np.zeros((ARENA_SIZE, ARENA_SIZE), np.uint8)
+        for x, y in game_state.game_map:
+            for unit in game_state.game_map[x, y]:
+                if unit.stationary:
+                    self._type[y, x] = self.unit_ids[unit.unit_type]
+                    self._owner[y, x] = unit.player_index
+                    self._hp[y, x] = min(int(unit.health), 255)
+                    self._upgraded[y, x] = unit.upgraded
+                    break
+        self._enemy_bb = np.bitwise_or.reduce(np.where(self._owner == 1, COLUMN_BITS, np.uint64(0)), axis=1)
+        # Built on first use by _threat_grid
+        self._threat = None
+
 
     """
     NOTE: All the methods after this point are part of the sample starter-algo
@@ -75,8 +166,9 @@ class AlgoStrategy(gamelib.AlgoCore):
         """
         # First, place basic defenses
         self.build_defences(game_state)
-        # Now build reactive defenses based on where the enemy scored and then update your defences
-        self.build_reactive_defense(game_state)
+        # Now build reactive defenses based on where the enemy scored, if they have scored yet
+        if self.scored_on_locations:
+            self.build_reactive_defense(game_state)
         # Now update the defence based on points
         self.update_defence(game_state)
 
@@ -86,7 +178,7 @@ class AlgoStrategy(gamelib.AlgoCore):
         else:
             # Now let's analyze the enemy base to see where their defenses are concentrated.
             # If they have many units in the front we can build a line for our demolishers to attack them at long range.
-            if self.detect_enemy_unit(game_state, unit_type=None, valid_x=None, valid_y=[14, 15]) > 10:
+            if self._count_enemy_rows(14, 15) > 10:
                 self.demolisher_line_strategy(game_state)
             else:
                 # They don't have many units in the front so lets figure out their least defended area and send Scouts there.
@@ -95,13 +187,211 @@ class AlgoStrategy(gamelib.AlgoCore):
                 # Sending more at once is better since attacks can only hit a single scout at a time
                 if game_state.turn_number % 2 == 1:
                     # To simplify we will just check sending them from back left and right
-                    scout_spawn_location_options = [[13, 0], [14, 0]]
-                    best_location = self.least_damage_spawn_location(game_state, scout_spawn_location_options)
+                    best_location = self.least_damage_spawn_location(game_state, SCOUT_SPAWN_OPTIONS)
                     game_state.attempt_spawn(SCOUT, best_location, 1000)
 
                 # Lastly, if we have spare SP, let's build some supports
-                support_locations = [[13, 2], [14, 2], [13, 3], [14, 3]]
-                game_state.attempt_spawn(SUPPORT, support_locations)        
+                game_state.attempt_spawn(SUPPORT, SUPPORT_LOCATIONS)        
+
+    def build_defences(self, game_state):
+        """
+        Build basic defenses using hardcoded locations.
+        Remember to defend corners and avoid placing units in the front where enemy demolishers can attack them.
+        """
+        # Useful tool for setting up your base locations: https://www.kevinbai.design/terminal-map-maker
+        # More community tools available at: https://terminal.c1games.com/rules#Download
+
+        # Place turrets that attack enemy units
+        # attempt_spawn will try to spawn units if we have resources, and will check if a blocking unit is already there
+        game_state.attempt_spawn(TURRET, TURRET_LOCATIONS)
+
+        # Place walls in front of turrets to soak up damage for them
+        game_state.attempt_spawn(WALL, WALL_LOCATIONS)
+
+        # Place supports to heal our turrets and walls
+        if self._cached_defence_cmp(game_state, [1, 11], [22, 11]):
+            support_location = [[3, 11]] 
+        else:
+            support_location = [[24, 11]]
+
+        game_state.attempt_spawn(SUPPORT, support_location)    
+
+    def build_reactive_defense(self, game_state):
+        """
+        This function builds reactive defenses based on where the enemy scored on us from.
+        We can track where the opponent scored by looking at events in action frames 
+        as shown in the on_action_frame function
+        """
+        # Build turrets two spaces above so that they don't block our own edge spawn locations
+        build_locations = [[x + 2, y + 2] for x, y in self.scored_on_locations]
+        game_state.attempt_spawn(TURRET, build_locations)
+
+    def update_defence(self, game_state):
+        """
+        Tops up the turrets beside the center and the wall and support rows,
+        upgrading the turrets once we have SP to spare.
+        """
+        # Update_defence based on points
+        if game_state.get_resource(SP) < 12:
+            game_state.attempt_spawn(TURRET, [12, 11])
+            game_state.attempt_spawn(TURRET, [15, 11])
+        else:
+            for location in ([12, 11], [15, 11]):
+                if game_state.attempt_spawn(TURRET, location) == 0 and game_state.contains_stationary_unit(location):
+                    game_state.attempt_upgrade(location)
+        game_state.attempt_spawn(WALL, WALL_ROW_LEFT)
+        game_state.attempt_spawn(WALL, WALL_ROW_RIGHT)
+        game_state.attempt_spawn(SUPPORT, SUPPORT_ROW_LEFT)
+        game_state.attempt_spawn(SUPPORT, SUPPORT_ROW_RIGHT)
+
+    def stall_with_interceptors(self, game_state):
+        """
+        Send out interceptors at random locations to defend our base from enemy moving units.
+        """
+        # We can spawn moving units on our edges so a list of all our edge locations
+        friendly_edges = game_state.game_map.get_edge_locations(game_state.game_map.BOTTOM_LEFT) + game_state.game_map.get_edge_locations(game_state.game_map.BOTTOM_RIGHT)
+        
+        # Remove locations that are blocked by our own structures 
+        # since we can't deploy units there.
+        deploy_locations = self.filter_blocked_locations(friendly_edges, game_state)
+        
+        # While we have remaining MP to spend lets send out interceptors randomly.
+        while game_state.get_resource(MP) >= game_state.type_cost(INTERCEPTOR)[MP] and len(deploy_locations) > 0:
+            # Choose a random deploy location.
+            deploy_index = random.randint(0, len(deploy_locations) - 1)
+            deploy_location = deploy_locations[deploy_index]
+            
+            game_state.attempt_spawn(INTERCEPTOR, deploy_location)
+            """
+            We don't have to remove the location since multiple mobile 
+            units can occupy the same space.
+            """
+
+    def demolisher_line_strategy(self, game_state):
+        """
+        Build a line of the cheapest stationary unit so our demolisher can attack from long range.
+        """
+        # First let's figure out the cheapest unit
+        # We could just check the game rules, but this demonstrates how to use the GameUnit class
+        stationary_units = [WALL, TURRET, SUPPORT]
+        cheapest_unit = WALL
+        for unit in stationary_units:
+            unit_class = gamelib.GameUnit(unit, game_state.config)
+            if unit_class.cost[game_state.MP] < gamelib.GameUnit(cheapest_unit, game_state.config).cost[game_state.MP]:
+                cheapest_unit = unit
+
+        # Now let's build out a line of stationary units. This will prevent our demolisher from running into the enemy base.
+        # Instead they will stay at the perfect distance to attack the front two rows of the enemy base.
+        game_state.attempt_spawn(cheapest_unit, DEMOLISHER_LINE)
+
+        # Now spawn demolishers next to the line
+        # By asking attempt_spawn to spawn 1000 units, it will essentially spawn as many as we have resources for
+        game_state.attempt_spawn(DEMOLISHER, [24, 10], 1000)
+
+    def filter_blocked_locations(self, locations, game_state):
+        filtered = []
+        for location in locations:
+            if not game_state.contains_stationary_unit(location):
+                filtered.append(location)
+        return filtered
+
+    def detect_enemy_unit(self, unit_type=None, valid_x = None, valid_y = None):
+        """
+        Counts enemy structures on the current turn's snapshot.
+        Pass a unit type and/or lists of valid x and y coordinates to narrow the count.
+        """
+        mask = self._owner == 1
+        if unit_type is not None:
+            mask &= self._type == self.unit_ids[unit_type]
+        if valid_x is not None:
+            mask &= np.isin(X_INDEX, valid_x)
+        if valid_y is not None:
+            mask &= np.isin(Y_INDEX, valid_y)
+        return int(mask.sum())
+
+    def _count_enemy_rows(self, y0, y1):
+        """
+        Counts enemy structures in rows y0 through y1 (inclusive) of the snapshot.
+        """
+        return sum(bin(int(row)).count("1") for row in self._enemy_bb[y0:y1 + 1])
+
+    def _cached_defence_cmp(self, game_state, left, right, height=5):
+        """
+        Returns True if analyze_enemy_defences finds fewer enemy structures at left than at right.
+        The analysis only depends on enemy structures in the rows it scans, so the
+        verdict is reused until the enemy bitboards of those rows change.
+        """
+        low = max(min(left[1], right[1]) - height + 1, 0)
+        high = max(left[1], right[1]) + 1
+        bb_key = self._enemy_bb[low:high].tobytes()
+        key = (tuple(left), tuple(right), height)
+        cached = self._defence_cmp_cache.get(key)
+        if cached is not None and cached[0] == bb_key:
+            return cached[1]
+        # analyze_enemy_defences returns None for out of bounds coordinates
+        left_counts = game_state.analyze_enemy_defences(left, height) or {'TOTAL': 0}
+        right_counts = game_state.analyze_enemy_defences(right, height) or {'TOTAL': 0}
+        result = left_counts['TOTAL'] < right_counts['TOTAL']
+        self._defence_cmp_cache[key] = (bb_key, result)
+        return result
+
+    def _enemy_turrets(self):
+        """
+        Returns the x coordinates, y coordinates, damage and squared range
+        of every enemy turret in the snapshot as arrays for the damage kernels.
+        """
+        ys, xs = np.nonzero((self._type == self.unit_ids[TURRET]) & (self._owner == 1))
+        upgraded = self._upgraded[ys, xs]
+        return xs.astype(np.int32), ys.astype(np.int32), self.turret_damage[upgraded], self.turret_range2[upgraded]
+
+    def _threat_grid(self):
+        """
+        Returns a 28x28 float32 grid indexed [y, x] holding the damage enemy turrets deal
+        to a mobile unit on each tile. It is built once per turn, on first use,
+        so every damage query afterwards is a lookup.
+        """
+        if self._threat is None:
+            tx, ty, dmg, rng2 = self._enemy_turrets()
+            self._threat = build_threat_grid(tx, ty, dmg, rng2, ARENA_SIZE)
+        return self._threat
+
+    def path_damage(self, path):
+        """
+        Returns the total turret damage taken walking path, an int32 array of [x, y] tiles.
+        """
+        return float(self._threat_grid()[path[:, 1], path[:, 0]].sum())
+
+    def least_damage_spawn_location(self, game_state, location_options):
+        """
+        This function will help us guess which location is the safest to spawn moving units from.
+        It gets the path the unit will take then checks the enemy turrets in range of each tile on it,
+        returning the location that takes the least turret damage.
+        """
+        damages = []
+        for location in location_options:
+            path = self._find_path(game_state, location)
+            if path is None:
+                # The location is blocked so nothing can spawn there
+                damages.append(math.inf)
+                continue
+            damages.append(self.path_damage(path))
+        return location_options[damages.index(min(damages))]
+
+    def _find_path(self, game_state, start_location):
+        """
+        Returns find_path_to_edge for start_location as an int32 array, or None if it is blocked.
+        Paths only depend on where structures are, so they are cached until the
+        snapshot or the structures we queued this turn change.
+        """
+        board_key = hash((self._type.tobytes(), tuple(game_state._build_stack)))
+        if board_key != self._path_board_key:
+            self._path_board_key = board_key
+            self._path_cache = {}
+        key = tuple(start_location)
+        if key not in self._path_cache:
+            path = game_state.find_path_to_edge(start_location)
+            self._path_cache[key] = None if path is None else np.asarray(path, dtype=np.int32)
+        return self._path_cache[key]
 
     def on_action_frame(self, turn_string):
         """
@@ -110,8 +400,11 @@ class AlgoStrategy(gamelib.AlgoCore):
         Processing the action frames is complicated so we only suggest it if you have time and experience.
         Full doc on format of a game frame at in json-docs.html in the root of the Starterkit.
         """
+        # Most frames have no breaches, so skip parsing them entirely
+        if '"breach":[[' not in turn_string:
+            return
         # Let's record at what position we get scored on
-        state = json.loads(turn_string)
+        state = json_loads(turn_string)
         events = state["events"]
         breaches = events["breach"]
         for breach in breaches:
@@ -121,92 +414,10 @@ class AlgoStrategy(gamelib.AlgoCore):
             # 1 is integer for yourself, 2 is opponent (StarterKit code uses 0, 1 as player_index instead)
             if not unit_owner_self:
                 gamelib.debug_write("Got scored on at: {}".format(location))
-                self.scored_on_locations.append(location)
+                self.scored_on_locations.add(tuple(location))
                 gamelib.debug_write("All locations: {}".format(self.scored_on_locations))
 
 
 if __name__ == "__main__":
     algo = AlgoStrategy()
     algo.start()
-
-
-
-    class Defence: 
-        def build_defences(self, game_state):
-            """
-            Build basic defenses using hardcoded locations.
-            Remember to defend corners and avoid placing units in the front where enemy demolishers can attack them.
-            """
-            # Useful tool for setting up your base locations: https://www.kevinbai.design/terminal-map-maker
-            # More community tools available at: https://terminal.c1games.com/rules#Download
-
-            # Place turrets that attack enemy units
-            turret_locations = [[11, 11], [16, 11]]
-            # attempt_spawn will try to spawn units if we have resources, and will check if a blocking unit is already there
-            game_state.attempt_spawn(TURRET, turret_locations)
-            
-            # Place walls in front of turrets to soak up damage for them
-            wall_locations = [[5, 13], [6, 13], [7, 13], [8, 13], [9, 13], [18, 13], [19, 13] [20, 13], [21, 13], [22, 13]]
-            game_state.attempt_spawn(WALL, wall_locations)
-
-            # Place supports to heal our turrets and walls
-            if (game_state.analyze_enemy_defences([1,11]) < game_state.analyze_enemy_defences([22, 11])):
-                support_location = [[3, 11]] 
-            else:
-                support_location = [[24, 11]]
-
-            game_state.attempt_spawn(SUPPORT, support_location)    
-
-        def build_reactive_defense(self, game_state):
-            """
-            This function builds reactive defenses based on where the enemy scored on us from.
-            We can track where the opponent scored by looking at events in action frames 
-            as shown in the on_action_frame function
-            """
-            for location in self.scored_on_locations:
-                # Build turret one space above so that it doesn't block our own edge spawn locations
-                build_location = [location[0] + 2, location[1] + 2]
-                game_state.attempt_spawn(TURRET, build_location)
-
-        def update_defence(self, game_state):
-            structPoints = game_state.get_resources(0)
-            # Update_defence based on points
-            if (structPoints  <  12):
-                if (game_state.can_spawn(TURRET, [12, 11])):
-                    game_state.attempt_spawn(TURRET, [12, 11])
-                if (game_state.can_spawn(TURRET, [15, 11])):
-                    game_state.attempt_spawn(TURRET, [12, 11])
-                for i in range(1, 10):
-                    if (game_state.can_spawn(WALL, [i, 13])):
-                        game_state.attempt_spawn(WALL, [i, 13])
-                for i in range(17, 27):
-                    if (game_state.can_spawn(WALL, [i, 13])):
-                        game_state.attempt_spawn(WALL, [i, 13])
-                for i in range(1, 4):
-                    if (game_state.can_spawn(SUPPORT, [i, 12])):
-                        game_state.attempt_spawn(SUPPORT, [i, 13])
-                for i in range(24, 27):
-                    if (game_state.can_spawn(SUPPORT, [i, 12])):
-                        game_state.attempt_spawn(SUPPORT, [i, 13])
-            else:
-                if (game_state.can_spawn(TURRET, [12, 11])):
-                    game_state.attempt_spawn(TURRET, [12, 11])
-                else:
-                    game_state.attempt_upgrade(TURRET, [12, 11])
-                if (game_state.can_spawn(TURRET, [15, 11])):
-                    game_state.attempt_spawn(TURRET, [15, 11])
-                else:
-                    game_state.attempt_upgrade(TURRET, [15, 11])                                   
-                for i in range(1, 10):
-                    if (game_state.can_spawn(WALL, [i, 13])):
-                        game_state.attempt_spawn(WALL, [i, 13])
-                for i in range(17, 27):
-                    if (game_state.can_spawn(WALL, [i, 13])):
-                        game_state.attempt_spawn(WALL, [i, 13])
-                for i in range(1, 4):
-                    if (game_state.can_spawn(SUPPORT, [i, 12])):
-                        game_state.attempt_spawn(SUPPORT, [i, 13])
-                for i in range(24, 27):
-                    if (game_state.can_spawn(SUPPORT, [i, 12])):
-                        game_state.attempt_spawn(SUPPORT, [i, 13])
-                
\ No newline at end of file